@@ -11,6 +11,7 @@ Usage:
 Requires: Python 3.8+
 """
 
+import io
 import json
 import os
 import re
@@ -18,6 +19,35 @@ import sys
 from pathlib import Path
 from datetime import datetime
 
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+_TAG_RE = re.compile(r'#\w+')
+_TITLE_SANITIZE = re.compile(r'[^\w\s\-]')
+# Lookaheads keep bucket priority (decision > action > insight) regardless of
+# where in the line the keyword appears; m.lastindex names the bucket.
+_BUCKET_RE = re.compile(
+    r'(?=.*?(decided|concluded|chose))'
+    r'|(?=.*?(built|created|posted|implemented))'
+    r'|(?=.*?(realized|understood|noticed))', re.I)
+_TOPIC_KEYWORDS = {
+    'memory': ['memory', 'remember', 'persistence'],
+    'decision': ['decided', 'conclusion', 'chose'],
+    'tools': ['skill', 'script', 'tool', 'build'],
+    'philosophy': ['continuity', 'existence', 'identity']
+}
+# Optional: one automaton pass finds every topic keyword instead of a
+# substring scan per word.
+_TOPIC_AUTOMATON = None
+if ahocorasick is not None:
+    _TOPIC_AUTOMATON = ahocorasick.Automaton()
+    for _topic, _words in _TOPIC_KEYWORDS.items():
+        for _word in _words:
+            _TOPIC_AUTOMATON.add_word(_word, _topic)
+    _TOPIC_AUTOMATON.make_automaton()
+
 class SessionCapture:
     def __init__(self, memory_dir=None):
         if memory_dir is None:
@@ -36,30 +66,30 @@ class SessionCapture:
         self.memory_dir.mkdir(exist_ok=True)
     
     def _extract_tags(self, text):
-        tags = set(re.findall(r'#\w+', text))
-        keywords = {
-            'memory': ['memory', 'remember', 'persistence'],
-            'decision': ['decided', 'conclusion', 'chose'],
-            'tools': ['skill', 'script', 'tool', 'build'],
-            'philosophy': ['continuity', 'existence', 'identity']
-        }
+        tags = set(_TAG_RE.findall(text))
         text_lower = text.lower()
-        for topic, words in keywords.items():
-            if any(w in text_lower for w in words):
-                tags.add(f"#{topic}")
+        if _TOPIC_AUTOMATON is not None:
+            tags.update(f"#{topic}" for _, topic in _TOPIC_AUTOMATON.iter(text_lower))
+        else:
+            for topic, words in _TOPIC_KEYWORDS.items():
+                if any(w in text_lower for w in words):
+                    tags.add(f"#{topic}")
         return list(tags)
     
     def capture(self, obs_type, content, context=None):
         ts = datetime.now()
         date_str = ts.strftime('%Y-%m-%d')
         obs_file = self.memory_dir / f"{date_str}-observations.md"
-        with open(obs_file, 'a', encoding='utf-8') as f:
-            if obs_file.stat().st_size == 0:
-                f.write(f"# {date_str} observations\n\n")
-            f.write(f"## {ts.strftime('%H:%M')} - {obs_type}\n\n{content}\n\n")
-            tags = self._extract_tags(content)
-            if tags: f.write(f"tags: {' '.join(tags)}\n\n")
-            f.write("---\n\n")
+        parts = [f"## {ts.strftime('%H:%M')} - {obs_type}\n\n{content}\n\n"]
+        tags = self._extract_tags(content)
+        if tags: parts.append(f"tags: {' '.join(tags)}\n\n")
+        parts.append("---\n\n")
+        # One write per observation; append mode already sits at EOF, so
+        # tell() says whether the header is needed without a separate stat.
+        with open(obs_file, 'ab') as f:
+            if f.tell() == 0:
+                parts.insert(0, f"# {date_str} observations\n\n")
+            f.write(''.join(parts).encode('utf-8'))
     
     def decision(self, text, reasoning=None):
         content = f"Decision: {text}"
@@ -76,16 +106,23 @@ class SessionCapture:
         date_str = ts.strftime('%Y-%m-%d')
         # Sanitize title to prevent path traversal
         if title:
-            title = re.sub(r'[^\w\s\-]', '', title).strip()[:100]
+            title = _TITLE_SANITIZE.sub('', title).strip()[:100]
         decisions, actions, insights, questions = [], [], [], []
-        for line in conversation.split('\n'):
+        # Lines are read lazily and only the first few per bucket are kept,
+        # so long transcripts stop being scanned once every bucket is full.
+        for line in io.StringIO(conversation):
             line = line.strip()
             if not line: continue
-            ll = line.lower()
-            if any(m in ll for m in ['decided', 'concluded', 'chose']): decisions.append(line)
+            m = _BUCKET_RE.match(line)
+            bucket = m.lastindex if m else None
+            if bucket == 1: decisions.append(line)
             elif '?' in line and len(line) < 200: questions.append(line)
-            elif any(m in ll for m in ['built', 'created', 'posted', 'implemented']): actions.append(line)
-            elif any(m in ll for m in ['realized', 'understood', 'noticed']): insights.append(line)
+            elif bucket == 2: actions.append(line)
+            elif bucket == 3: insights.append(line)
+            else: continue
+            if (len(decisions) >= 5 and len(actions) >= 5
+                    and len(insights) >= 3 and len(questions) >= 3):
+                break
         
         title = title or f"conversation-{ts.strftime('%H%M')}"
         out_file = self.memory_dir / f"{date_str}-{title}.md"
@@ -6,7 +6,7 @@ Memory Search Tool - 3-layer progressive disclosure for agent memory files
 Usage:
     python memory-search.py index              # Build search index
     python memory-search.py search "query"     # Layer 1: compact snippets
-    python memory-search.py timeline --date 2026-02-01  # Layer 2: chronological
+    python memory-search.py timeline --date 2026-02-01  # Layer 2: chronological (from index)
     python memory-search.py get /path/file.md  # Layer 3: full content
 
 Requires: Python 3.8+, SQLite (built-in)
@@ -14,13 +14,60 @@ Requires: Python 3.8+, SQLite (built-in)
 
 import os
 import json
+import hashlib
+import mmap
 import sqlite3
 import argparse
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import re
 import sys
 
+_TAG_RE = re.compile(r'#\w+')
+_DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+_QUERY_SANITIZE = re.compile(r'[^\w\s\-]')
+_SCHEMA_VERSION = 6
+_MMAP_THRESHOLD = 64 * 1024
+_SEARCH_SQL = """
+    WITH fts AS (
+        -- FTS5 sorts on its built-in rank (bm25) itself, so snippet() only
+        -- runs for the rows that survive LIMIT; ordering by a bm25() result
+        -- column would make SQLite build a snippet for every match first.
+        SELECT rowid, rank AS score,
+               snippet(memory_fts, 0, '<mark>', '</mark>', '...', 15) AS snippet
+        FROM memory_fts WHERE memory_fts MATCH ? ORDER BY rank LIMIT ?
+    )
+    SELECT d.path, d.basename, d.summary, d.date, d.tags, fts.snippet
+    FROM fts JOIN documents d ON d.id = fts.rowid ORDER BY fts.score
+"""
+
+def _sql_extract_tags(content):
+    return " ".join(_TAG_RE.findall(content)) if content is not None else None
+
+# Returns (digest, bytes), with bytes None when the digest matches old_digest.
+# Large files are hashed straight from the page cache via mmap and only
+# copied into Python when their content actually changed.
+def _read_changed(path, size, old_digest):
+    if size <= _MMAP_THRESHOLD:
+        data = Path(path).read_bytes()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        return digest, (None if digest == old_digest else data)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        digest = hashlib.blake2b(mm, digest_size=16).digest()
+        return digest, (None if digest == old_digest else mm[:])
+
+# DirEntry caches stat results; symlinked dirs are not followed
+def _walk_md(root):
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False): stack.append(e.path)
+                    elif e.name.endswith('.md') and not e.name.startswith('.'): yield e
+        except OSError:
+            continue
+
 class MemorySearcher:
     def __init__(self, memory_dir=None):
         if memory_dir is None:
@@ -38,61 +85,182 @@ class MemorySearcher:
         
         self.memory_dir = Path(memory_dir)
         self.db_path = self.memory_dir / "search_index.db"
+        # One connection per searcher so pragmas are applied once and
+        # sqlite3's per-connection statement cache survives across calls.
+        # Autocommit mode: index_memory_files issues BEGIN/COMMIT itself.
+        # check_same_thread is off to skip the per-call thread check; the
+        # searcher must still not be shared across threads.
+        try:
+            self.conn = self._connect(str(self.db_path), "PRAGMA journal_mode=WAL;")
+        except sqlite3.OperationalError:
+            if not self.db_path.exists(): raise
+            # A WAL index needs to create its -shm file, which fails in a
+            # read-only memory dir; open the existing index as immutable so
+            # search/timeline/get still work there.
+            self.conn = self._connect(f"{self.db_path.resolve().as_uri()}?immutable=1", "", uri=True)
+        self.conn.create_function("extract_tags", 1, _sql_extract_tags, deterministic=True)
         self._init_database()
     
+    def _connect(self, database, journal_pragma, uri=False):
+        conn = sqlite3.connect(database, isolation_level=None,
+                               check_same_thread=False, uri=uri)
+        try:
+            conn.row_factory = sqlite3.Row
+            conn.executescript(journal_pragma + """
+                PRAGMA synchronous=NORMAL;
+                PRAGMA temp_store=MEMORY;
+                PRAGMA cache_size=-65536;
+            """)
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+    
+    def close(self):
+        if getattr(self, 'conn', None) is not None:
+            self.conn.close()
+            self.conn = None
+    
+    def __del__(self):
+        self.close()
+    
     def _init_database(self):
-        conn = sqlite3.connect(str(self.db_path))
-        conn.execute("""
+        conn = self.conn
+        # Read-only commands must not write, so the DDL only runs when the
+        # stored layout is missing or outdated. The index is derived from the
+        # markdown files, so an outdated layout is dropped and repopulated by
+        # the next `index` run.
+        if conn.execute("PRAGMA user_version").fetchone()[0] == _SCHEMA_VERSION:
+            return
+        try:
+            self._create_schema()
+        except BaseException:
+            if conn.in_transaction: conn.execute("ROLLBACK")
+            raise
+    
+    def _create_schema(self):
+        self.conn.executescript(f"""
+            BEGIN IMMEDIATE;
+            DROP TABLE IF EXISTS memory_fts;
+            DROP TABLE IF EXISTS documents;
+            DROP TABLE IF EXISTS files;
+            DROP TABLE IF EXISTS timeline_idx;
+            -- content stays the last column: SQLite reads a row's columns in
+            -- order, so metadata placed after a large value would require
+            -- walking that value's overflow pages on every result row.
+            CREATE TABLE IF NOT EXISTS documents(
+                id INTEGER PRIMARY KEY, path TEXT UNIQUE, basename TEXT,
+                date TEXT, tags TEXT, summary TEXT, content TEXT
+            );
+            CREATE TABLE IF NOT EXISTS files(
+                path TEXT PRIMARY KEY, mtime_ns INTEGER, hash BLOB
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS timeline_idx(
+                date TEXT, path TEXT, basename TEXT, PRIMARY KEY (date, path)
+            ) WITHOUT ROWID;
             CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts USING fts5(
-                file_path, content, date_created, tags, summary
-            )
+                content, tags, summary, content='documents', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS documents_ai AFTER INSERT ON documents BEGIN
+                INSERT INTO memory_fts(rowid, content, tags, summary)
+                VALUES (new.id, new.content, new.tags, new.summary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS documents_ad AFTER DELETE ON documents BEGIN
+                INSERT INTO memory_fts(memory_fts, rowid, content, tags, summary)
+                VALUES ('delete', old.id, old.content, old.tags, old.summary);
+            END;
+            CREATE TRIGGER IF NOT EXISTS documents_au AFTER UPDATE ON documents BEGIN
+                INSERT INTO memory_fts(memory_fts, rowid, content, tags, summary)
+                VALUES ('delete', old.id, old.content, old.tags, old.summary);
+                INSERT INTO memory_fts(rowid, content, tags, summary)
+                VALUES (new.id, new.content, new.tags, new.summary);
+            END;
+            PRAGMA user_version = {_SCHEMA_VERSION};
+            COMMIT;
         """)
-        conn.close()
     
     def index_memory_files(self):
-        conn = sqlite3.connect(str(self.db_path))
-        conn.execute("DELETE FROM memory_fts")
-        indexed = 0
-        for md_file in self.memory_dir.glob("**/*.md"):
-            if md_file.name.startswith('.'): continue
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            indexed, unchanged, removed = self._sync_files()
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        print(f"Indexed {indexed} files in {self.memory_dir} "
+              f"({unchanged} unchanged, {removed} removed)")
+    
+    def _sync_files(self):
+        conn = self.conn
+        known = {r['path']: (r['mtime_ns'], r['hash'])
+                 for r in conn.execute("SELECT path, mtime_ns, hash FROM files")}
+        seen, rows, file_rows = set(), [], []
+        for entry in _walk_md(self.memory_dir):
+            path = entry.path
             try:
-                with open(md_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                date_match = re.search(r'(\d{4}-\d{2}-\d{2})', md_file.name)
+                st = entry.stat()
+                mtime_ns = st.st_mtime_ns
+                prev = known.get(path)
+                if prev and prev[0] == mtime_ns:
+                    seen.add(path)
+                    continue
+                digest, data = _read_changed(path, st.st_size, prev[1] if prev else None)
+                if data is None:
+                    # Touched but unchanged: remember the new mtime, skip the reindex
+                    conn.execute("UPDATE files SET mtime_ns=? WHERE path=?", (mtime_ns, path))
+                    seen.add(path)
+                    continue
+                content = data.decode('utf-8', errors='replace')
+                date_match = _DATE_RE.search(entry.name)
                 date_created = date_match.group(1) if date_match else "unknown"
-                tags = " ".join(re.findall(r'#\w+', content))
                 lines = content.strip().split('\n')
                 first_para = next((l.strip() for l in lines if l.strip() and not l.startswith('#')), content[:200])
                 summary = first_para[:200]
-                conn.execute("INSERT INTO memory_fts VALUES (?,?,?,?,?)",
-                    (str(md_file), content, date_created, tags, summary))
-                indexed += 1
+                rows.append((path, entry.name, content, date_created, summary))
+                file_rows.append((path, mtime_ns, digest))
+                seen.add(path)
             except Exception as e:
-                print(f"Warning: {md_file}: {e}")
-        conn.commit()
-        conn.close()
-        print(f"Indexed {indexed} files in {self.memory_dir}")
+                print(f"Warning: {path}: {e}")
+        stale = [(p,) for p in known.keys() - seen]
+        changed = [(r[0],) for r in rows]
+        conn.executemany("DELETE FROM documents WHERE path=?", stale + changed)
+        conn.executemany("DELETE FROM files WHERE path=?", stale)
+        # Tags are derived in the same statement so the FTS insert trigger sees them
+        conn.executemany("""
+            INSERT INTO documents(path, basename, content, date, tags, summary)
+            VALUES (?1, ?2, ?3, ?4, extract_tags(?3), ?5)
+        """, rows)
+        conn.executemany("INSERT OR REPLACE INTO files VALUES (?,?,?)", file_rows)
+        if rows or stale:
+            # Materialized once per index run so timeline() never scans documents
+            conn.execute("DELETE FROM timeline_idx")
+            conn.execute("""
+                INSERT INTO timeline_idx
+                SELECT date, path, basename FROM documents WHERE date != 'unknown'
+            """)
+        return len(rows), len(seen) - len(rows), len(stale)
     
     def search(self, query, limit=10):
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        cursor = conn.execute("""
-            SELECT file_path, summary, date_created, tags,
-                   snippet(memory_fts, 1, '<mark>', '</mark>', '...', 15) as snippet
-            FROM memory_fts WHERE memory_fts MATCH ? ORDER BY rank LIMIT ?
-        """, (query, limit))
-        results = [{'file': Path(r['file_path']).name, 'date': r['date_created'],
-                    'snippet': r['snippet'], 'tags': r['tags'], 'path': r['file_path']}
-                   for r in cursor]
-        conn.close()
-        return results
+        cursor = self.conn.execute(_SEARCH_SQL, (query, limit))
+        return [{'file': r['basename'], 'date': r['date'],
+                 'snippet': r['snippet'], 'tags': r['tags'], 'path': r['path']}
+                for r in cursor]
     
-    def timeline(self, around_date=None):
-        files = []
-        for md in sorted(self.memory_dir.glob("**/*.md")):
-            m = re.search(r'(\d{4}-\d{2}-\d{2})', md.name)
-            if m: files.append({'file': md.name, 'date': m.group(1), 'path': str(md)})
-        return files
+    def timeline(self, around_date=None, window_days=7):
+        if around_date:
+            center = datetime.strptime(around_date, '%Y-%m-%d')
+            span = timedelta(days=window_days)
+            # Clamp at the calendar ends instead of overflowing datetime
+            lo = center - span if center - datetime.min > span else datetime.min
+            hi = center + span if datetime.max - center > span else datetime.max
+            cursor = self.conn.execute(
+                "SELECT path, basename, date FROM timeline_idx WHERE date BETWEEN ? AND ? ORDER BY date, path",
+                (lo.date().isoformat(), hi.date().isoformat()))
+        else:
+            cursor = self.conn.execute(
+                "SELECT path, basename, date FROM timeline_idx ORDER BY date, path")
+        return [{'file': r['basename'], 'date': r['date'], 'path': r['path']}
+                for r in cursor]
     
     def get_content(self, paths):
         result = {}
@@ -101,8 +269,7 @@ class MemorySearcher:
             mem_real = os.path.realpath(str(self.memory_dir)) + os.sep
             if not real.startswith(mem_real) and real != mem_real.rstrip(os.sep):
                 raise ValueError(f"Path traversal blocked: {p} resolves outside memory directory")
-            with open(real, 'r', encoding='utf-8') as f:
-                result[Path(real).name] = f.read()
+            result[Path(real).name] = Path(real).read_text(encoding='utf-8')
         return result
 
 def main():
@@ -118,18 +285,25 @@ def main():
     if args.cmd == 'index': s.index_memory_files()
     elif args.cmd == 'search':
         # Sanitize FTS5 query to prevent injection
-        safe_query = re.sub(r'[^\w\s\-]', '', args.query or '')
+        safe_query = _QUERY_SANITIZE.sub('', args.query or '')
         if len(safe_query) > 500:
             print("Error: query too long (max 500 chars)")
             sys.exit(1)
         results = s.search(safe_query, args.limit)
-        print(json.dumps(results, indent=2) if args.json else
-              '\n'.join(f"{r['file']} ({r['date']}): {r['snippet'][:80]}..." for r in results))
+        sys.stdout.write((json.dumps(results, indent=2) if args.json else
+                          '\n'.join(f"{r['file']} ({r['date']}): {r['snippet'][:80]}..." for r in results)) + '\n')
     elif args.cmd == 'timeline':
+        if args.date:
+            try:
+                datetime.strptime(args.date, '%Y-%m-%d')
+            except ValueError:
+                print("Error: --date must be YYYY-MM-DD")
+                sys.exit(1)
         t = s.timeline(args.date)
-        print(json.dumps(t, indent=2) if args.json else '\n'.join(f"{e['date']} - {e['file']}" for e in t[-10:]))
+        sys.stdout.write((json.dumps(t, indent=2) if args.json else
+                          '\n'.join(f"{e['date']} - {e['file']}" for e in t[-10:])) + '\n')
     elif args.cmd == 'get' and args.query:
         c = s.get_content([args.query])
-        print(json.dumps(c, indent=2) if args.json else list(c.values())[0])
+        sys.stdout.write((json.dumps(c, indent=2) if args.json else list(c.values())[0]) + '\n')
 
 if __name__ == "__main__": main()
@@ -6,9 +6,12 @@ Skill Safety Check - Query PromptIntel before installing skills
 Usage:
     python skill-check.py <skill-name>
     python skill-check.py <skill-name> --author <author>
+    python skill-check.py <skill-name> --force-refresh
 
 Checks the PromptIntel threat feed for known malicious skills.
 Returns exit code 0 if no threats found, 1 if threats detected.
+The feed is cached in ~/.cache/skill-check/feed.db for an hour, then
+revalidated with a conditional GET (ETag / Last-Modified).
 
 Requires: PromptIntel API key (https://promptintel.novahunting.ai/settings)
 """
@@ -16,9 +19,21 @@ Requires: PromptIntel API key (https://promptintel.novahunting.ai/settings)
 import os
 import sys
 import json
+import time
+import sqlite3
+import urllib.error
 import urllib.request
 from pathlib import Path
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+FEED_URL = "https://api.promptintel.novahunting.ai/api/v1/agent-feed"
+CACHE_DIR = Path.home() / ".cache/skill-check"
+FEED_MAX_AGE = 3600  # seconds a cached feed is trusted without asking the server
+
 def load_api_key():
     config_paths = [
         Path.home() / ".config/promptintel/credentials.json",
@@ -34,42 +49,104 @@ def load_api_key():
             except: continue
     return os.environ.get('PROMPTINTEL_API_KEY')
 
-def check_skill(skill_name, author=None):
+def open_feed_db():
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(CACHE_DIR / "feed.db"))
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS meta(key TEXT PRIMARY KEY, value TEXT)")
+        try:
+            # trigram keeps the old substring semantics ('evil' matches 'evilskill')
+            conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS threats USING fts5(
+                title, description, severity UNINDEXED, action UNINDEXED, item UNINDEXED,
+                tokenize='trigram')""")
+        except sqlite3.OperationalError:
+            # SQLite < 3.34 has no trigram tokenizer; lookups fall back to a scan
+            conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS threats USING fts5(
+                title, description, severity UNINDEXED, action UNINDEXED, item UNINDEXED)""")
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
+
+def refresh_feed(conn, api_key, force=False):
+    meta = dict(conn.execute("SELECT key, value FROM meta"))
+    if not force and time.time() - float(meta.get('fetched_at', 0)) < FEED_MAX_AGE:
+        return
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "User-Agent": "skill-check/1.0"
+    }
+    if not force:
+        if 'etag' in meta: headers["If-None-Match"] = meta['etag']
+        if 'last_modified' in meta: headers["If-Modified-Since"] = meta['last_modified']
+    req = urllib.request.Request(FEED_URL, headers=headers)
+    try:
+        resp = urllib.request.urlopen(req, timeout=10)
+    except urllib.error.HTTPError as e:
+        if e.code != 304: raise
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('fetched_at', ?)", (str(time.time()),))
+        return
+    with resp, conn:
+        if ijson is not None:
+            # Stream items straight into the insert instead of building the whole tree
+            items = ijson.items(resp, 'data.item', use_float=True)
+        else:
+            items = json.loads(resp.read().decode()).get('data', [])
+        conn.execute("DELETE FROM threats")
+        conn.executemany("INSERT INTO threats VALUES (?,?,?,?,?)",
+            ((item.get('title', ''), item.get('description', ''), item.get('severity'),
+              item.get('action'), json.dumps(item)) for item in items))
+        conn.execute("DELETE FROM meta")
+        conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+            (key, value) for key, value in (
+                ('etag', resp.headers.get('ETag')),
+                ('last_modified', resp.headers.get('Last-Modified')),
+                ('fetched_at', str(time.time())),
+            ) if value])
+
+def find_threats(conn, term):
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'threats'").fetchone()[0]
+    if 'trigram' in sql and len(term) >= 3:
+        return dict(conn.execute("SELECT rowid, item FROM threats WHERE threats MATCH ?",
+                                 ('"' + term.replace('"', '""') + '"',)))
+    else:
+        # Scan the cached rows in Python: SQL LIKE only folds ASCII case,
+        # while term was lowered with str.lower()
+        return {rowid: item for rowid, title, desc, item in
+                conn.execute("SELECT rowid, title, description, item FROM threats")
+                if term in title.lower() or term in desc.lower()}
+
+def check_skill(skill_name, author=None, force_refresh=False):
     api_key = load_api_key()
     if not api_key:
         print("Warning: No PromptIntel API key found.")
         print("Get a key at: https://promptintel.novahunting.ai/settings")
         return None
     
-    url = "https://api.promptintel.novahunting.ai/api/v1/agent-feed"
-    req = urllib.request.Request(url, headers={
-        "Authorization": f"Bearer {api_key}",
-        "User-Agent": "skill-check/1.0"
-    })
-    
     try:
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            data = json.loads(resp.read().decode())
-    except Exception as e:
-        print(f"Warning: Could not reach PromptIntel: {e}")
+        conn = open_feed_db()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Warning: Could not open feed cache: {e}")
         return None
     
-    threats = []
-    skill_lower = skill_name.lower()
-    author_lower = author.lower() if author else None
-    
-    for item in data.get('data', []):
-        title = item.get('title', '').lower()
-        desc = item.get('description', '').lower()
-        if skill_lower in title or skill_lower in desc:
-            threats.append(item)
-        elif author_lower and (author_lower in title or author_lower in desc):
-            threats.append(item)
-    return threats
+    try:
+        try:
+            refresh_feed(conn, api_key, force_refresh)
+        except Exception as e:
+            print(f"Warning: Could not reach PromptIntel: {e}")
+            return None
+        
+        matches = find_threats(conn, skill_name.lower())
+        if author: matches.update(find_threats(conn, author.lower()))
+        # rowid order is feed order
+        return [json.loads(matches[rowid]) for rowid in sorted(matches)]
+    finally:
+        conn.close()
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: skill-check.py <skill-name> [--author <author>]")
+        print("Usage: skill-check.py <skill-name> [--author <author>] [--force-refresh]")
         sys.exit(0)
     
     skill_name = sys.argv[1]
@@ -95,7 +172,7 @@ def main():
     if author: print(f"Author: {author}")
     print()
     
-    threats = check_skill(skill_name, author)
+    threats = check_skill(skill_name, author, '--force-refresh' in sys.argv)
     
     if threats is None:
         print("Could not verify - proceed with caution")
@@ -106,13 +183,13 @@ def main():
         print("\nNote: Absence of threats does not guarantee safety.")
         sys.exit(0)
     
-    print(f"THREATS DETECTED: {len(threats)} match(es)\n")
+    lines = [f"THREATS DETECTED: {len(threats)} match(es)\n"]
     for t in threats:
-        print(f"  [{t.get('severity', '?').upper()}] {t.get('title')}")
-        print(f"  Action: {t.get('action', '?')}")
-        print(f"  {t.get('description', '')[:150]}...\n")
-    
-    print("RECOMMENDATION: Do not install this skill.")
+        lines.append(f"  [{t.get('severity', '?').upper()}] {t.get('title')}")
+        lines.append(f"  Action: {t.get('action', '?')}")
+        lines.append(f"  {t.get('description', '')[:150]}...\n")
+    lines.append("RECOMMENDATION: Do not install this skill.")
+    sys.stdout.write('\n'.join(lines) + '\n')
     sys.exit(1)
 
 if __name__ == "__main__": main()